@@ -0,0 +1,194 @@
+"""Rollups de atividade por cão (passeios e adestramento).
+
+Cada passeio/sessão contribui para um bucket diário e um semanal (semana
+começando na segunda-feira) em dog_activity_rollups. Os handlers de escrita
+chamam record_change com o estado antes e depois da alteração, e os
+contadores são ajustados com upsert atômico; rebuild recalcula tudo a
+partir de walks/trainings.
+
+Uso manual: python analytics.py rebuild
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+import models
+
+PERIODS = ("day", "week")
+COUNTERS = ("total", "completed", "canceled", "minutes", "completed_minutes")
+
+STATUS_COMPLETED = "concluido"
+STATUS_CANCELED = "cancelado"
+
+def activity_state(obj) -> Optional[tuple]:
+    """Estado de um passeio/sessão relevante para os rollups"""
+    if obj is None or obj.scheduled_date is None:
+        return None
+    if isinstance(obj, models.Walk):
+        activity, training_type = "walk", ""
+    else:
+        activity, training_type = "training", obj.training_type or ""
+    return (obj.dog_id, activity, training_type, obj.scheduled_date,
+            obj.duration_minutes or 0, obj.status or "agendado")
+
+def period_start(period: str, day: date) -> date:
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+def _contributions(state: tuple, sign: int = 1):
+    """Chaves dos buckets e incrementos de cada contador"""
+    dog_id, activity, training_type, scheduled_date, minutes, status = state
+    completed = status == STATUS_COMPLETED
+    deltas = {
+        "total": sign,
+        "completed": sign if completed else 0,
+        "canceled": sign if status == STATUS_CANCELED else 0,
+        "minutes": sign * minutes,
+        "completed_minutes": sign * minutes if completed else 0,
+    }
+    day = scheduled_date.date() if isinstance(scheduled_date, datetime) else scheduled_date
+    for period in PERIODS:
+        yield (dog_id, period, period_start(period, day), activity, training_type), deltas
+
+def _upsert(db: Session, key: tuple, deltas: dict):
+    dog_id, period, start, activity, training_type = key
+    table = models.DogActivityRollup.__table__
+    stmt = sqlite_insert(table).values(
+        dog_id=dog_id, period=period, period_start=start,
+        activity=activity, training_type=training_type, **deltas
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["dog_id", "period", "period_start", "activity", "training_type"],
+        set_={name: table.c[name] + stmt.excluded[name] for name in COUNTERS}
+    )
+    db.execute(stmt)
+
+def record_change(db: Session, before: Optional[tuple], after: Optional[tuple]):
+    """Ajusta os rollups para uma alteração (before/after vêm de activity_state).
+    Deve ser chamado antes do commit, na mesma transação da escrita."""
+    if before == after:
+        return
+    changes = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for state, sign in ((before, -1), (after, 1)):
+        if state is None:
+            continue
+        for key, deltas in _contributions(state, sign):
+            for name, value in deltas.items():
+                changes[key][name] += value
+    for key, deltas in changes.items():
+        if any(deltas.values()):
+            _upsert(db, key, deltas)
+
+def rebuild(db: Session, dog_id: Optional[int] = None) -> int:
+    """Recalcula os rollups (de um cão ou de todos). Retorna o número de buckets.
+
+    Roda em uma transação de escrita (BEGIN IMMEDIATE): passeios e sessões
+    gravados durante o recálculo esperam o commit e são somados depois, em
+    vez de se perderem entre a leitura e a regravação dos rollups."""
+    # Encerra o que estiver pendente na sessão antes de pegar o lock de escrita
+    db.commit()
+    db.execute(text("BEGIN IMMEDIATE"))
+    totals = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for model in (models.Walk, models.Training):
+        query = db.query(model)
+        if dog_id is not None:
+            query = query.filter(model.dog_id == dog_id)
+        for obj in query.yield_per(1000):
+            state = activity_state(obj)
+            if state is None:
+                continue
+            for key, deltas in _contributions(state):
+                for name, value in deltas.items():
+                    totals[key][name] += value
+
+    query = db.query(models.DogActivityRollup)
+    if dog_id is not None:
+        query = query.filter(models.DogActivityRollup.dog_id == dog_id)
+    query.delete(synchronize_session=False)
+
+    db.bulk_insert_mappings(models.DogActivityRollup, [
+        {"dog_id": key[0], "period": key[1], "period_start": key[2],
+         "activity": key[3], "training_type": key[4], **counters}
+        for key, counters in totals.items()
+    ])
+    db.commit()
+    return len(totals)
+
+def _rate(completed: int, total: int) -> Optional[float]:
+    return round(completed / total, 3) if total else None
+
+def dog_analytics(db: Session, dog_id: int, period: str = "week",
+                  count: int = 12, today: Optional[date] = None) -> dict:
+    """Série temporal dos últimos `count` períodos, lida só dos rollups"""
+    today = today or datetime.utcnow().date()
+    end = period_start(period, today)
+    step = timedelta(weeks=1) if period == "week" else timedelta(days=1)
+    since = end - step * (count - 1)
+
+    rows = db.query(models.DogActivityRollup).filter(
+        models.DogActivityRollup.dog_id == dog_id,
+        models.DogActivityRollup.period == period,
+        models.DogActivityRollup.period_start >= since,
+        models.DogActivityRollup.period_start <= end
+    ).all()
+
+    buckets = {}
+    for i in range(count):
+        start = since + step * i
+        buckets[start] = {
+            "period_start": start,
+            "walks": 0, "walks_completed": 0, "walk_minutes": 0,
+            "trainings": 0, "trainings_completed": 0, "training_minutes": 0,
+        }
+    by_type = defaultdict(lambda: {"sessions": 0, "completed": 0, "minutes": 0})
+
+    for row in rows:
+        bucket = buckets[row.period_start]
+        if row.activity == "walk":
+            bucket["walks"] += row.total
+            bucket["walks_completed"] += row.completed
+            bucket["walk_minutes"] += row.completed_minutes
+        else:
+            bucket["trainings"] += row.total
+            bucket["trainings_completed"] += row.completed
+            bucket["training_minutes"] += row.completed_minutes
+            stats = by_type[row.training_type]
+            stats["sessions"] += row.total
+            stats["completed"] += row.completed
+            stats["minutes"] += row.completed_minutes
+
+    series = []
+    for bucket in buckets.values():
+        bucket["completion_rate"] = _rate(
+            bucket["walks_completed"] + bucket["trainings_completed"],
+            bucket["walks"] + bucket["trainings"]
+        )
+        series.append(bucket)
+
+    return {
+        "dog_id": dog_id,
+        "period": period,
+        "series": series,
+        "trainings_by_type": [
+            {"training_type": training_type, **stats,
+             "completion_rate": _rate(stats["completed"], stats["sessions"])}
+            for training_type, stats in sorted(by_type.items())
+        ],
+    }
+
+if __name__ == "__main__":
+    import sys
+    from database import SessionLocal, Base, engine
+
+    if sys.argv[1:] != ["rebuild"]:
+        print("Uso: python analytics.py rebuild")
+        sys.exit(1)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        print(f"[OK] Rollups recalculados: {rebuild(db)} buckets")
+    finally:
+        db.close()
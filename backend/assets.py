@@ -0,0 +1,226 @@
+"""Pipeline de assets do frontend.
+
+Separa o CSS e o JS embutidos em static/index.html em bundles minificados
+com hash de conteúdo no nome (cache imutável), gera variantes .gz/.br
+pré-comprimidas e um shell HTML leve que referencia os bundles.
+
+Uso manual: python assets.py
+"""
+from typing import Optional
+import gzip
+import hashlib
+import json
+import os
+import re
+
+from fastapi import HTTPException
+from fastapi.responses import FileResponse, Response
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional; sem ele só geramos .gz
+    brotli = None
+
+STATIC_DIR = "static"
+SOURCE_HTML = os.path.join(STATIC_DIR, "index.html")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST_PATH = os.path.join(DIST_DIR, "manifest.json")
+SHELL_NAME = "index.html"
+ASSETS_URL = "/assets"
+
+PROFILE_PLACEHOLDER = "<!--PET_PROFILE-->"
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+NO_CACHE = "no-cache"
+
+# O Starlette já acrescenta "; charset=utf-8" aos tipos text/*
+MEDIA_TYPES = {
+    ".css": "text/css",
+    ".js": "application/javascript; charset=utf-8",
+    ".html": "text/html",
+}
+
+# Ordem de preferência das variantes comprimidas
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+_STYLE_RE = re.compile(r"\s*<style>(.*?)</style>", re.S)
+_SCRIPT_RE = re.compile(r"\s*<script>(.*?)</script>", re.S)
+
+_manifest: Optional[dict] = None
+_shell_cache: Optional[str] = None
+
+# ============ MINIFICAÇÃO ============
+
+def minify_css(css: str) -> str:
+    """Remove comentários e espaços desnecessários do CSS"""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    css = css.replace(";}", "}")
+    return css.strip()
+
+def minify_js(js: str) -> str:
+    """Minificação conservadora do JS: remove indentação, linhas vazias e
+    comentários de linha inteira, sem reescrever o código"""
+    lines = []
+    for line in js.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("//"):
+            continue
+        lines.append(stripped)
+    return "\n".join(lines)
+
+# ============ BUILD ============
+
+def _content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:12]
+
+def _write_with_variants(path: str, data: bytes):
+    """Grava o arquivo e suas variantes pré-comprimidas"""
+    with open(path, "wb") as f:
+        f.write(data)
+    with open(path + ".gz", "wb") as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + ".br", "wb") as f:
+            f.write(brotli.compress(data, quality=11))
+    elif os.path.exists(path + ".br"):
+        os.remove(path + ".br")
+
+def _split_html(html: str, css_tag: str, js_tag: str) -> str:
+    """Substitui o CSS e o JS inline pelas tags dos bundles"""
+    html = _STYLE_RE.sub(lambda m: "\n    " + css_tag, html, count=1)
+    return _SCRIPT_RE.sub(
+        lambda m: "\n    " + PROFILE_PLACEHOLDER + "\n    " + js_tag, html, count=1
+    )
+
+def build_assets(force: bool = False) -> dict:
+    """Gera os bundles em static/dist. Não faz nada se o index.html de
+    origem não mudou desde o último build."""
+    global _manifest, _shell_cache
+
+    with open(SOURCE_HTML, "rb") as f:
+        source = f.read()
+    source_hash = _content_hash(source)
+
+    if not force:
+        manifest = load_manifest()
+        if manifest and manifest.get("source") == source_hash:
+            return manifest
+
+    html = source.decode("utf-8")
+    style = _STYLE_RE.search(html)
+    script = _SCRIPT_RE.search(html)
+    if not style or not script:
+        raise ValueError("index.html sem <style> ou <script> inline")
+
+    os.makedirs(DIST_DIR, exist_ok=True)
+    files = {}
+    for kind, content in (("css", minify_css(style.group(1))), ("js", minify_js(script.group(1)))):
+        data = content.encode("utf-8")
+        name = f"app.{_content_hash(data)}.{kind}"
+        _write_with_variants(os.path.join(DIST_DIR, name), data)
+        files[kind] = name
+
+    shell = _split_html(
+        html,
+        f'<link rel="stylesheet" href="{ASSETS_URL}/{files["css"]}">',
+        f'<script src="{ASSETS_URL}/{files["js"]}"></script>'
+    )
+    _write_with_variants(os.path.join(DIST_DIR, SHELL_NAME), shell.encode("utf-8"))
+
+    # Remover bundles de builds anteriores
+    keep = set(files.values()) | {SHELL_NAME, "manifest.json"}
+    for name in os.listdir(DIST_DIR):
+        base = name[:-3] if name.endswith((".gz", ".br")) else name
+        if base not in keep:
+            os.remove(os.path.join(DIST_DIR, name))
+
+    manifest = {"source": source_hash, "css": files["css"], "js": files["js"]}
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    _manifest = manifest
+    _shell_cache = shell
+    return manifest
+
+def load_manifest() -> Optional[dict]:
+    global _manifest
+    if _manifest is None and os.path.exists(MANIFEST_PATH):
+        with open(MANIFEST_PATH) as f:
+            _manifest = json.load(f)
+    return _manifest
+
+# ============ SERVIDOR ============
+
+def _accepts(accept_encoding: str, encoding: str) -> bool:
+    """Verifica se o header Accept-Encoding aceita a codificação (q > 0)"""
+    weights = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+    return weights.get(encoding, weights.get("*", 0.0)) > 0
+
+def _file_response(path: str, accept_encoding: str, cache_control: str) -> FileResponse:
+    """Responde com a melhor variante pré-comprimida aceita pelo cliente"""
+    media_type = MEDIA_TYPES.get(os.path.splitext(path)[1], "application/octet-stream")
+    headers = {"Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    for encoding, suffix in ENCODINGS:
+        if _accepts(accept_encoding, encoding) and os.path.exists(path + suffix):
+            headers["Content-Encoding"] = encoding
+            return FileResponse(path + suffix, media_type=media_type, headers=headers)
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+def asset_response(filename: str, accept_encoding: str) -> FileResponse:
+    """Servir um bundle com hash (cache imutável)"""
+    manifest = load_manifest()
+    if not manifest or filename not in (manifest["css"], manifest["js"]):
+        raise HTTPException(status_code=404, detail="Asset não encontrado")
+    return _file_response(os.path.join(DIST_DIR, filename), accept_encoding, IMMUTABLE_CACHE)
+
+def shell_response(accept_encoding: str) -> Response:
+    """Servir o shell HTML (sempre revalidado, pois aponta para os bundles atuais)"""
+    if load_manifest() is None:
+        return FileResponse(SOURCE_HTML, headers={"Cache-Control": NO_CACHE})
+    return _file_response(os.path.join(DIST_DIR, SHELL_NAME), accept_encoding, NO_CACHE)
+
+def _load_shell() -> str:
+    global _shell_cache
+    if _shell_cache is None:
+        with open(os.path.join(DIST_DIR, SHELL_NAME), encoding="utf-8") as f:
+            _shell_cache = f.read()
+    return _shell_cache
+
+def pet_profile_response(profile_json: Optional[str], accept_encoding: str) -> Response:
+    """Servir o shell com o perfil público embutido, poupando o fetch inicial"""
+    if profile_json is None or load_manifest() is None:
+        return shell_response(accept_encoding)
+
+    # Escapar "<" impede que dados do perfil fechem a tag <script>
+    safe_json = profile_json.replace("<", "\\u003c")
+    html = _load_shell().replace(
+        PROFILE_PLACEHOLDER,
+        f"<script>window.__PET_PROFILE__ = {safe_json};</script>",
+        1
+    )
+    body = html.encode("utf-8")
+    headers = {"Cache-Control": NO_CACHE, "Vary": "Accept-Encoding"}
+    if _accepts(accept_encoding, "gzip"):
+        body = gzip.compress(body, compresslevel=6)
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type=MEDIA_TYPES[".html"], headers=headers)
+
+if __name__ == "__main__":
+    manifest = build_assets(force=True)
+    print(f"[OK] Assets gerados em {DIST_DIR}: {manifest['css']}, {manifest['js']}")
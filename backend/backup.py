@@ -0,0 +1,381 @@
+"""Backup online do banco SQLite e da pasta uploads/.
+
+Layout do repositório de backups:
+
+    backups/
+        objects/ab/abcdef...    # conteúdo endereçado por SHA-256 (banco e mídias)
+        snapshots/<id>.json     # manifesto de cada snapshot
+
+O banco é copiado com a API de backup online do SQLite, em passos, para não
+bloquear as escritas da aplicação. As mídias são incrementais: arquivos com
+mesmo tamanho e mtime do snapshot anterior não são relidos, e conteúdo já
+presente em objects/ não é copiado de novo.
+
+Uso:
+    python backup.py create
+    python backup.py list
+    python backup.py verify [snapshot]
+    python backup.py restore <snapshot> [--prune]
+    python backup.py schedule --interval 3600 --keep 24
+"""
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+DB_PATH = os.path.join("data", "petwalker.db")
+UPLOADS_DIR = "uploads"
+BACKUP_DIR = "backups"
+
+# Páginas copiadas por passo e pausa entre passos (libera o lock para escritores)
+STEP_PAGES = 256
+STEP_SLEEP = 0.005
+# Se o banco for alterado durante a cópia o SQLite reinicia o backup; após
+# esse número de reinícios fazemos a cópia em um único passo
+MAX_RESTARTS = 5
+
+CHUNK_SIZE = 1024 * 1024
+
+class BackupError(Exception):
+    pass
+
+class _TooManyRestarts(Exception):
+    pass
+
+# ============ UTILITÁRIOS ============
+
+def _objects_dir(backup_dir: str) -> str:
+    return os.path.join(backup_dir, "objects")
+
+def _snapshots_dir(backup_dir: str) -> str:
+    return os.path.join(backup_dir, "snapshots")
+
+def _object_path(backup_dir: str, digest: str) -> str:
+    return os.path.join(_objects_dir(backup_dir), digest[:2], digest)
+
+def _hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _store_object(backup_dir: str, path: str, digest: str, move: bool = False) -> bool:
+    """Copia o arquivo para objects/ se ainda não existir. Retorna True se gravou."""
+    target = _object_path(backup_dir, digest)
+    if os.path.exists(target):
+        if move:
+            os.remove(path)
+        return False
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = target + ".tmp"
+    if move:
+        shutil.move(path, tmp)
+    else:
+        shutil.copyfile(path, tmp)
+    os.replace(tmp, target)
+    return True
+
+def _ingest_file(backup_dir: str, path: str) -> tuple:
+    """Copia o arquivo para objects/ calculando o hash durante a cópia, de modo
+    que o objeto gravado sempre corresponde ao hash. Retorna (hash, gravou)."""
+    h = hashlib.sha256()
+    tmp_dir = _objects_dir(backup_dir)
+    fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "wb") as out, open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                h.update(chunk)
+                out.write(chunk)
+        digest = h.hexdigest()
+        return digest, _store_object(backup_dir, tmp, digest, move=True)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def _write_json(path: str, data: dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+# ============ BANCO DE DADOS ============
+
+def _open_object(path: str) -> sqlite3.Connection:
+    """Abre um banco de objects/ sem escrever nada (nem -wal/-shm) no repositório"""
+    # as_uri() escapa ?, # e % do caminho
+    uri = Path(path).absolute().as_uri()
+    return sqlite3.connect(f"{uri}?mode=ro&immutable=1", uri=True)
+
+def backup_database(src_path: str, dest_path: str,
+                    pages: int = STEP_PAGES, sleep: float = STEP_SLEEP,
+                    immutable_source: bool = False) -> dict:
+    """Copia o banco com a API de backup online do SQLite, em passos.
+    `immutable_source` é usado ao restaurar a partir de objects/."""
+    restarts = 0
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal restarts, last_remaining
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1
+            if restarts > MAX_RESTARTS:
+                raise _TooManyRestarts()
+        last_remaining = remaining
+
+    src = _open_object(src_path) if immutable_source else sqlite3.connect(src_path)
+    try:
+        dest = sqlite3.connect(dest_path)
+        try:
+            try:
+                src.backup(dest, pages=pages, progress=progress, sleep=sleep)
+            except _TooManyRestarts:
+                # Banco muito movimentado: cópia em um único passo (consistente)
+                src.backup(dest, pages=-1)
+        finally:
+            dest.close()
+    finally:
+        src.close()
+    return {"restarts": restarts}
+
+def check_database(path: str):
+    """Executa PRAGMA integrity_check sem alterar o arquivo"""
+    conn = _open_object(path)
+    try:
+        result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+    finally:
+        conn.close()
+    if result != "ok":
+        raise BackupError(f"Banco corrompido: {result}")
+
+# ============ SNAPSHOTS ============
+
+def list_snapshots(backup_dir: str = BACKUP_DIR) -> list:
+    folder = _snapshots_dir(backup_dir)
+    if not os.path.isdir(folder):
+        return []
+    return sorted(name[:-5] for name in os.listdir(folder) if name.endswith(".json"))
+
+def load_snapshot(snapshot_id: str, backup_dir: str = BACKUP_DIR) -> dict:
+    path = os.path.join(_snapshots_dir(backup_dir), f"{snapshot_id}.json")
+    if not os.path.exists(path):
+        raise BackupError(f"Snapshot não encontrado: {snapshot_id}")
+    with open(path) as f:
+        return json.load(f)
+
+def _latest_snapshot(backup_dir: str) -> Optional[dict]:
+    snapshots = list_snapshots(backup_dir)
+    return load_snapshot(snapshots[-1], backup_dir) if snapshots else None
+
+def create_snapshot(db_path: str = DB_PATH, uploads_dir: str = UPLOADS_DIR,
+                    backup_dir: str = BACKUP_DIR,
+                    pages: int = STEP_PAGES, sleep: float = STEP_SLEEP) -> dict:
+    """Cria um snapshot incremental do banco e das mídias"""
+    started = time.monotonic()
+    os.makedirs(_objects_dir(backup_dir), exist_ok=True)
+    os.makedirs(_snapshots_dir(backup_dir), exist_ok=True)
+
+    snapshot_id = datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ")
+    previous = _latest_snapshot(backup_dir)
+    previous_files = previous["files"] if previous else {}
+    stats = {"files": 0, "hashed": 0, "stored": 0, "stored_bytes": 0}
+
+    # Banco: cópia online para arquivo temporário e depois para objects/
+    fd, tmp_db = tempfile.mkstemp(suffix=".db", dir=backup_dir)
+    os.close(fd)
+    try:
+        db_stats = backup_database(db_path, tmp_db, pages=pages, sleep=sleep)
+        db_digest = _hash_file(tmp_db)
+        db_size = os.path.getsize(tmp_db)
+        if _store_object(backup_dir, tmp_db, db_digest, move=True):
+            stats["stored"] += 1
+            stats["stored_bytes"] += db_size
+    finally:
+        if os.path.exists(tmp_db):
+            os.remove(tmp_db)
+
+    # Mídias: só relê arquivos cujo tamanho ou mtime mudou
+    files = {}
+    for root, _, names in os.walk(uploads_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, uploads_dir).replace(os.sep, "/")
+            st = os.stat(path)
+            prev = previous_files.get(rel)
+            if prev and prev["size"] == st.st_size and prev["mtime_ns"] == st.st_mtime_ns \
+                    and os.path.exists(_object_path(backup_dir, prev["sha256"])):
+                digest = prev["sha256"]
+            else:
+                digest, stored = _ingest_file(backup_dir, path)
+                stats["hashed"] += 1
+                if stored:
+                    stats["stored"] += 1
+                    stats["stored_bytes"] += st.st_size
+            files[rel] = {"sha256": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+            stats["files"] += 1
+
+    manifest = {
+        "id": snapshot_id,
+        "created_at": datetime.utcnow().isoformat(),
+        "parent": previous["id"] if previous else None,
+        "database": {"sha256": db_digest, "size": db_size, "restarts": db_stats["restarts"]},
+        "files": files,
+        "stats": stats,
+        "elapsed_seconds": round(time.monotonic() - started, 3),
+    }
+    _write_json(os.path.join(_snapshots_dir(backup_dir), f"{snapshot_id}.json"), manifest)
+    return manifest
+
+def verify_snapshot(snapshot_id: str, backup_dir: str = BACKUP_DIR) -> list:
+    """Confere o hash de cada objeto e a integridade do banco. Retorna os erros."""
+    manifest = load_snapshot(snapshot_id, backup_dir)
+    errors = []
+    entries = [("<database>", manifest["database"]["sha256"])]
+    entries += [(rel, info["sha256"]) for rel, info in manifest["files"].items()]
+
+    for name, digest in entries:
+        path = _object_path(backup_dir, digest)
+        if not os.path.exists(path):
+            errors.append(f"{name}: objeto ausente ({digest})")
+        elif _hash_file(path) != digest:
+            errors.append(f"{name}: hash divergente ({digest})")
+
+    if not errors:
+        try:
+            check_database(_object_path(backup_dir, manifest["database"]["sha256"]))
+        except (BackupError, sqlite3.DatabaseError) as e:
+            errors.append(f"<database>: {e}")
+    return errors
+
+def restore_snapshot(snapshot_id: str, db_path: str = DB_PATH,
+                     uploads_dir: str = UPLOADS_DIR, backup_dir: str = BACKUP_DIR,
+                     prune: bool = False) -> dict:
+    """Restaura banco e mídias de um snapshot (verificado antes de escrever)"""
+    errors = verify_snapshot(snapshot_id, backup_dir)
+    if errors:
+        raise BackupError("Snapshot inválido: " + "; ".join(errors))
+    manifest = load_snapshot(snapshot_id, backup_dir)
+
+    # A API de backup também serve para restaurar sobre um banco em uso
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    backup_database(_object_path(backup_dir, manifest["database"]["sha256"]), db_path,
+                    pages=-1, immutable_source=True)
+
+    restored = 0
+    for rel, info in manifest["files"].items():
+        target = os.path.join(uploads_dir, *rel.split("/"))
+        if os.path.exists(target) and os.path.getsize(target) == info["size"] \
+                and _hash_file(target) == info["sha256"]:
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(_object_path(backup_dir, info["sha256"]), target + ".tmp")
+        os.replace(target + ".tmp", target)
+        restored += 1
+
+    removed = 0
+    if prune:
+        for root, _, names in os.walk(uploads_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                rel = os.path.relpath(path, uploads_dir).replace(os.sep, "/")
+                if rel not in manifest["files"]:
+                    os.remove(path)
+                    removed += 1
+
+    return {"restored": restored, "removed": removed}
+
+def prune_snapshots(keep: int, backup_dir: str = BACKUP_DIR) -> int:
+    """Mantém os últimos `keep` snapshots e remove objetos não referenciados"""
+    snapshots = list_snapshots(backup_dir)
+    for snapshot_id in snapshots[:-keep] if keep > 0 else []:
+        os.remove(os.path.join(_snapshots_dir(backup_dir), f"{snapshot_id}.json"))
+
+    referenced = set()
+    for snapshot_id in list_snapshots(backup_dir):
+        manifest = load_snapshot(snapshot_id, backup_dir)
+        referenced.add(manifest["database"]["sha256"])
+        referenced.update(info["sha256"] for info in manifest["files"].values())
+
+    removed = 0
+    for root, _, names in os.walk(_objects_dir(backup_dir)):
+        for name in names:
+            if name not in referenced:
+                os.remove(os.path.join(root, name))
+                removed += 1
+    return removed
+
+def run_scheduled(interval: float, keep: int = 0, **kwargs):
+    """Modo agendado: cria um snapshot a cada `interval` segundos"""
+    while True:
+        started = time.monotonic()
+        try:
+            manifest = create_snapshot(**kwargs)
+            print(f"[OK] Snapshot {manifest['id']} criado em {manifest['elapsed_seconds']}s "
+                  f"({manifest['stats']['stored']} objetos novos)")
+            if keep:
+                prune_snapshots(keep, kwargs.get("backup_dir", BACKUP_DIR))
+        except (BackupError, OSError, sqlite3.Error) as e:
+            print(f"[ERRO] Falha no backup: {e}")
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+# ============ CLI ============
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backup do PetWalker")
+    parser.add_argument("--backup-dir", default=BACKUP_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("create", help="Criar snapshot")
+    sub.add_parser("list", help="Listar snapshots")
+
+    verify = sub.add_parser("verify", help="Verificar snapshot (padrão: o mais recente)")
+    verify.add_argument("snapshot", nargs="?")
+
+    restore = sub.add_parser("restore", help="Restaurar snapshot")
+    restore.add_argument("snapshot")
+    restore.add_argument("--prune", action="store_true",
+                         help="Remover de uploads/ arquivos que não estão no snapshot")
+
+    schedule = sub.add_parser("schedule", help="Criar snapshots periodicamente")
+    schedule.add_argument("--interval", type=float, default=3600)
+    schedule.add_argument("--keep", type=int, default=24)
+
+    args = parser.parse_args(argv)
+    backup_dir = args.backup_dir
+
+    try:
+        if args.command == "create":
+            manifest = create_snapshot(backup_dir=backup_dir)
+            print(f"[OK] Snapshot {manifest['id']} criado: {manifest['stats']}")
+        elif args.command == "list":
+            for snapshot_id in list_snapshots(backup_dir):
+                print(snapshot_id)
+        elif args.command == "verify":
+            snapshot_id = args.snapshot or (list_snapshots(backup_dir) or [None])[-1]
+            if snapshot_id is None:
+                raise BackupError("Nenhum snapshot encontrado")
+            errors = verify_snapshot(snapshot_id, backup_dir)
+            for error in errors:
+                print(f"[ERRO] {error}")
+            if errors:
+                return 1
+            print(f"[OK] Snapshot {snapshot_id} íntegro")
+        elif args.command == "restore":
+            result = restore_snapshot(args.snapshot, backup_dir=backup_dir, prune=args.prune)
+            print(f"[OK] Snapshot {args.snapshot} restaurado: {result}")
+        elif args.command == "schedule":
+            run_scheduled(args.interval, keep=args.keep, backup_dir=backup_dir)
+    except BackupError as e:
+        print(f"[ERRO] {e}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
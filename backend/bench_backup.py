@@ -0,0 +1,145 @@
+"""Benchmark do impacto do backup online no tráfego da aplicação.
+
+Cria um banco pelo engine da aplicação (database.engine, em WAL) e uma pasta
+uploads/ em um diretório temporário, simula escritas curtas como as dos
+handlers da API e mede vazão e latência em quatro cenários:
+
+- sem backup;
+- modo agendado: create_snapshot (banco e mídias) a cada --interval segundos,
+  como em `python backup.py schedule`;
+- pior caso: cópias do banco sem intervalo, em passos e em um único passo.
+
+Uso: python bench_backup.py [--seconds 10] [--interval 2] [--rows 20000]
+                            [--files 200] [--file-kb 256]
+"""
+from datetime import datetime
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+import backup
+
+def _prepare_db(rows: int):
+    from database import Base, SessionLocal, engine
+    import models
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        owner = models.User(email="bench@petwalker.com", name="Bench")
+        db.add(owner)
+        db.flush()
+        dogs = [models.Dog(name=f"Cão {i}", owner_id=owner.id) for i in range(50)]
+        db.add_all(dogs)
+        db.flush()
+        db.bulk_insert_mappings(models.Walk, [
+            {"dog_id": dogs[i % 50].id, "scheduled_date": datetime.utcnow(), "notes": "x" * 500}
+            for i in range(rows)
+        ])
+        db.commit()
+        return [dog.id for dog in dogs]
+    finally:
+        db.close()
+
+def _prepare_uploads(files: int, file_kb: int):
+    os.makedirs(os.path.join(backup.UPLOADS_DIR, "photos"), exist_ok=True)
+    for i in range(files):
+        with open(os.path.join(backup.UPLOADS_DIR, "photos", f"{i}.jpg"), "wb") as f:
+            f.write(os.urandom(file_kb * 1024))
+
+def _writer(dog_ids: list, stop: threading.Event, latencies: list):
+    """Uma sessão por escrita, como os handlers da API"""
+    from database import SessionLocal
+    import models
+
+    i = 0
+    while not stop.is_set():
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            db.add(models.Walk(dog_id=dog_ids[i % len(dog_ids)],
+                               scheduled_date=datetime.utcnow(), notes="passeio"))
+            db.commit()
+        finally:
+            db.close()
+        latencies.append(time.perf_counter() - started)
+        i += 1
+
+def _copy_loop(stop: threading.Event, pages: int, elapsed: list):
+    """Pior caso: uma cópia do banco atrás da outra"""
+    dest_dir = tempfile.mkdtemp()
+    dest = os.path.join(dest_dir, "copy.db")
+    while not stop.is_set():
+        started = time.monotonic()
+        backup.backup_database(backup.DB_PATH, dest, pages=pages)
+        elapsed.append(time.monotonic() - started)
+        os.remove(dest)
+    os.rmdir(dest_dir)
+
+def _scheduled_loop(stop: threading.Event, interval: float, elapsed: list):
+    """Modo agendado (mesma cadência de backup.run_scheduled)"""
+    while not stop.is_set():
+        started = time.monotonic()
+        backup.create_snapshot()
+        elapsed.append(time.monotonic() - started)
+        stop.wait(max(0.0, interval - (time.monotonic() - started)))
+
+def run_scenario(name: str, dog_ids: list, seconds: float, target=None, args=()):
+    latencies = []
+    elapsed = []
+    stop = threading.Event()
+    threads = [threading.Thread(target=_writer, args=(dog_ids, stop, latencies))]
+    if target is not None:
+        threads.append(threading.Thread(target=target, args=(stop, *args, elapsed)))
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    ms = sorted(l * 1000 for l in latencies)
+    p99 = ms[int(len(ms) * 0.99) - 1] if ms else 0
+    backup_ms = statistics.mean(elapsed) * 1000 if elapsed else 0
+    print(f"{name:<28} {len(ms) / seconds:>10.0f} {statistics.median(ms):>9.3f} "
+          f"{p99:>9.3f} {ms[-1]:>9.3f} {len(elapsed):>8} {backup_ms:>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do backup online")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--interval", type=float, default=2,
+                        help="intervalo entre snapshots no cenário agendado")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--file-kb", type=int, default=256)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # database.py usa caminhos relativos (data/petwalker.db)
+        os.chdir(tmp)
+        dog_ids = _prepare_db(args.rows)
+        _prepare_uploads(args.files, args.file_kb)
+        size_mb = os.path.getsize(backup.DB_PATH) / 1024 / 1024
+        uploads_mb = args.files * args.file_kb / 1024
+        print(f"Banco: {size_mb:.1f} MB (WAL), uploads: {args.files} arquivos / "
+              f"{uploads_mb:.0f} MB, {args.seconds}s por cenário")
+
+        # Primeiro snapshot (copia todas as mídias) fica fora da medição,
+        # como em um agendamento que já está rodando
+        manifest = backup.create_snapshot()
+        print(f"Snapshot inicial: {manifest['elapsed_seconds']}s")
+
+        print(f"{'cenário':<28} {'escritas/s':>10} {'p50 ms':>9} {'p99 ms':>9} "
+              f"{'max ms':>9} {'backups':>8} {'backup ms':>10}")
+        run_scenario("sem backup", dog_ids, args.seconds)
+        run_scenario(f"agendado (a cada {args.interval:g}s)", dog_ids, args.seconds,
+                     _scheduled_loop, (args.interval,))
+        run_scenario(f"contínuo, passos ({backup.STEP_PAGES} pág.)", dog_ids, args.seconds,
+                     _copy_loop, (backup.STEP_PAGES,))
+        run_scenario("contínuo, passo único", dog_ids, args.seconds, _copy_loop, (-1,))
+
+if __name__ == "__main__":
+    main()
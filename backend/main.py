@@ -1,30 +1,31 @@
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form, Request, Query
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Literal, Optional
 from datetime import timedelta
+import mimetypes
 import os
-import shutil
+import re
 import uuid
 
-from database import engine, get_db, Base
+from database import engine, get_db, Base, ensure_columns
 import models
 import schemas
+import assets
+import analytics
+from storage import get_storage, StorageBackend
+from ratelimit import RateLimitMiddleware, limiter_from_env
+from video import video_processor, STATUS_PENDING, STATUS_DONE
 from auth import (
     get_password_hash, verify_password, create_access_token,
     get_current_user, get_admin_user, ACCESS_TOKEN_EXPIRE_MINUTES
 )
 
-# Criar tabelas
-Base.metadata.create_all(bind=engine)
-
-# Criar diretórios necessários
-os.makedirs("data", exist_ok=True)
-os.makedirs("uploads", exist_ok=True)
-os.makedirs("uploads/photos", exist_ok=True)
-os.makedirs("uploads/videos", exist_ok=True)
+# Este módulo é importado de novo em cada processo do pool de vídeos (spawn
+# reexecuta o script principal), então nada aqui deve tocar no banco ou no
+# disco; tabelas e diretórios são criados no startup.
 
 app = FastAPI(
     title="🐕 PetWalker - Gestão de Passeios e Adestramento",
@@ -32,6 +33,11 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Rate limiting e descarte de carga (adicionado antes do CORS para que as
+# respostas 429/503 também recebam os headers de CORS)
+limiter = limiter_from_env()
+app.add_middleware(RateLimitMiddleware, limiter=limiter)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -41,8 +47,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Servir arquivos estáticos
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Servir arquivos estáticos (uploads/ é criado no startup)
+app.mount("/uploads", StaticFiles(directory="uploads", check_dir=False), name="uploads")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # ============ ROTAS DE AUTENTICAÇÃO ============
@@ -197,15 +203,44 @@ def delete_dog(
     db.commit()
     return {"message": "Cão removido com sucesso"}
 
+@app.get("/api/dogs/{dog_id}/analytics", response_model=schemas.DogAnalytics, tags=["Cães"])
+def get_dog_analytics(
+    dog_id: int,
+    period: Literal["day", "week"] = "week",
+    count: int = Query(12, ge=1, le=366),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_admin_user)
+):
+    """Estatísticas de passeios e adestramento por dia/semana (apenas admin)"""
+    dog = db.query(models.Dog).filter(models.Dog.id == dog_id).first()
+    if not dog:
+        raise HTTPException(status_code=404, detail="Cão não encontrado")
+    return analytics.dog_analytics(db, dog_id, period, count)
+
+@app.post("/api/analytics/rebuild", tags=["Dashboard"])
+def rebuild_analytics(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_admin_user)
+):
+    """Recalcular todos os agregados de atividade (apenas admin)"""
+    buckets = analytics.rebuild(db)
+    return {"message": "Agregados recalculados", "buckets": buckets}
+
 # ============ ROTA PÚBLICA - PERFIL DO CÃO ============
 
-@app.get("/api/public/dog/{access_code}", response_model=schemas.DogFullProfile, tags=["Público"])
+def public_profile(db: Session, dog: models.Dog) -> schemas.PublicDogProfile:
+    """Perfil público com o resumo de atividades das últimas semanas"""
+    profile = schemas.PublicDogProfile.model_validate(dog)
+    profile.analytics = schemas.DogAnalytics(**analytics.dog_analytics(db, dog.id))
+    return profile
+
+@app.get("/api/public/dog/{access_code}", response_model=schemas.PublicDogProfile, tags=["Público"])
 def get_public_dog_profile(access_code: str, db: Session = Depends(get_db)):
     """Visualizar perfil público do cão pelo código de acesso"""
     dog = db.query(models.Dog).filter(models.Dog.access_code == access_code).first()
     if not dog:
         raise HTTPException(status_code=404, detail="Perfil não encontrado")
-    return dog
+    return public_profile(db, dog)
 
 # ============ ROTAS DE PASSEIOS ============
 
@@ -234,6 +269,7 @@ def create_walk(
     
     db_walk = models.Walk(**walk.model_dump())
     db.add(db_walk)
+    analytics.record_change(db, None, analytics.activity_state(db_walk))
     db.commit()
     db.refresh(db_walk)
     return db_walk
@@ -250,10 +286,12 @@ def update_walk(
     if not walk:
         raise HTTPException(status_code=404, detail="Passeio não encontrado")
     
+    before = analytics.activity_state(walk)
     update_data = walk_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(walk, key, value)
     
+    analytics.record_change(db, before, analytics.activity_state(walk))
     db.commit()
     db.refresh(walk)
     return walk
@@ -269,6 +307,7 @@ def delete_walk(
     if not walk:
         raise HTTPException(status_code=404, detail="Passeio não encontrado")
     
+    analytics.record_change(db, analytics.activity_state(walk), None)
     db.delete(walk)
     db.commit()
     return {"message": "Passeio removido com sucesso"}
@@ -300,6 +339,7 @@ def create_training(
     
     db_training = models.Training(**training.model_dump())
     db.add(db_training)
+    analytics.record_change(db, None, analytics.activity_state(db_training))
     db.commit()
     db.refresh(db_training)
     return db_training
@@ -316,10 +356,12 @@ def update_training(
     if not training:
         raise HTTPException(status_code=404, detail="Sessão não encontrada")
     
+    before = analytics.activity_state(training)
     update_data = training_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(training, key, value)
     
+    analytics.record_change(db, before, analytics.activity_state(training))
     db.commit()
     db.refresh(training)
     return training
@@ -335,56 +377,142 @@ def delete_training(
     if not training:
         raise HTTPException(status_code=404, detail="Sessão não encontrada")
     
+    analytics.record_change(db, analytics.activity_state(training), None)
     db.delete(training)
     db.commit()
     return {"message": "Sessão removida com sucesso"}
 
 # ============ ROTAS DE MÍDIA (FOTOS/VÍDEOS) ============
 
+# Extensões geradas por media_extension; MEDIA_KEY_RE aceita exatamente esse formato
+MAX_EXTENSION_LENGTH = 10
+MEDIA_KEY_RE = re.compile(r"^(photos|videos)/[0-9a-f-]{36}\.[a-z0-9]{1,%d}$" % MAX_EXTENSION_LENGTH)
+
+def media_kind(content_type: Optional[str]):
+    """Determinar tipo de arquivo e pasta a partir do content type"""
+    if content_type and content_type.startswith("image/"):
+        return "image", "photos"
+    if content_type and content_type.startswith("video/"):
+        return "video", "videos"
+    raise HTTPException(status_code=400, detail="Tipo de arquivo não suportado")
+
+def media_extension(filename: Optional[str], content_type: Optional[str]) -> str:
+    """Extensão segura (minúsculas e alfanumérica) do nome do arquivo ou,
+    na falta dela, do content type; "bin" se nenhuma servir"""
+    for candidate in (os.path.splitext(filename or "")[1],
+                      mimetypes.guess_extension(content_type or "") or ""):
+        extension = re.sub(r"[^a-z0-9]", "", candidate.lower())[:MAX_EXTENSION_LENGTH]
+        if extension:
+            return extension
+    return "bin"
+
+def new_media_key(folder: str, filename: Optional[str], content_type: Optional[str]) -> str:
+    """Gerar chave única para o arquivo"""
+    return f"{folder}/{uuid.uuid4()}.{media_extension(filename, content_type)}"
+
+def media_file_path(storage: StorageBackend, key: str) -> str:
+    # No backend local mantém o formato histórico ("/uploads/photos/x.jpg")
+    return storage.url(key) if storage.name == "local" else key
+
 @app.post("/api/dogs/{dog_id}/media", response_model=schemas.MediaResponse, tags=["Mídia"])
-async def upload_media(
+def upload_media(
     dog_id: int,
     file: UploadFile = File(...),
     caption: str = Form(None),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_admin_user)
 ):
-    """Upload de foto ou vídeo (apenas admin)"""
+    """Upload de foto ou vídeo passando pela API (apenas admin)"""
     dog = db.query(models.Dog).filter(models.Dog.id == dog_id).first()
     if not dog:
         raise HTTPException(status_code=404, detail="Cão não encontrado")
     
-    # Determinar tipo de arquivo
-    content_type = file.content_type
-    if content_type.startswith("image/"):
-        file_type = "image"
-        folder = "photos"
-    elif content_type.startswith("video/"):
-        file_type = "video"
-        folder = "videos"
-    else:
-        raise HTTPException(status_code=400, detail="Tipo de arquivo não suportado")
-    
-    # Gerar nome único
-    extension = file.filename.split(".")[-1]
-    filename = f"{uuid.uuid4()}.{extension}"
-    file_path = f"uploads/{folder}/{filename}"
+    file_type, folder = media_kind(file.content_type)
+    key = new_media_key(folder, file.filename, file.content_type)
     
     # Salvar arquivo
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    storage = get_storage()
+    storage.save(key, file.file, file.content_type)
     
     # Salvar no banco
     db_media = models.Media(
         dog_id=dog_id,
-        file_path=f"/{file_path}",
+        file_path=media_file_path(storage, key),
+        file_type=file_type,
+        caption=caption,
+        storage_key=key,
+        content_type=file.content_type,
+        size_bytes=storage.size(key),
+        processing_status=STATUS_PENDING if file_type == "video" else None
+    )
+    db.add(db_media)
+    db.commit()
+    db.refresh(db_media)
+    
+    if file_type == "video":
+        video_processor.submit(db_media.id)
+    return db_media
+
+@app.post("/api/dogs/{dog_id}/media/upload-url", response_model=schemas.MediaUploadTicket, tags=["Mídia"])
+def create_media_upload_url(
+    dog_id: int,
+    upload: schemas.MediaUploadRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_admin_user)
+):
+    """Gerar URL pré-assinada para upload direto ao storage (apenas admin)"""
+    dog = db.query(models.Dog).filter(models.Dog.id == dog_id).first()
+    if not dog:
+        raise HTTPException(status_code=404, detail="Cão não encontrado")
+    
+    storage = get_storage()
+    if not storage.supports_direct_upload:
+        raise HTTPException(status_code=400, detail="Upload direto não disponível; use o envio pela API")
+    
+    _, folder = media_kind(upload.content_type)
+    key = new_media_key(folder, upload.filename, upload.content_type)
+    return {"key": key, **storage.presigned_upload(key, upload.content_type)}
+
+@app.post("/api/dogs/{dog_id}/media/complete", response_model=schemas.MediaResponse, tags=["Mídia"])
+def complete_media_upload(
+    dog_id: int,
+    upload: schemas.MediaUploadComplete,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_admin_user)
+):
+    """Registrar mídia enviada direto ao storage (apenas admin)"""
+    dog = db.query(models.Dog).filter(models.Dog.id == dog_id).first()
+    if not dog:
+        raise HTTPException(status_code=404, detail="Cão não encontrado")
+    
+    if not MEDIA_KEY_RE.match(upload.key):
+        raise HTTPException(status_code=400, detail="Chave de arquivo inválida")
+    if db.query(models.Media).filter(models.Media.storage_key == upload.key).first():
+        raise HTTPException(status_code=400, detail="Mídia já registrada")
+    
+    storage = get_storage()
+    size = storage.size(upload.key)
+    if size is None:
+        raise HTTPException(status_code=400, detail="Arquivo não encontrado no armazenamento")
+    
+    content_type = mimetypes.guess_type(upload.key)[0]
+    file_type = "image" if upload.key.startswith("photos/") else "video"
+    db_media = models.Media(
+        dog_id=dog_id,
+        file_path=media_file_path(storage, upload.key),
         file_type=file_type,
-        caption=caption
+        caption=upload.caption,
+        storage_key=upload.key,
+        content_type=content_type,
+        size_bytes=size,
+        processing_status=STATUS_PENDING if file_type == "video" else None
     )
     db.add(db_media)
     db.commit()
     db.refresh(db_media)
     
+    if file_type == "video":
+        video_processor.submit(db_media.id)
     return db_media
 
 @app.get("/api/dogs/{dog_id}/media", response_model=List[schemas.MediaResponse], tags=["Mídia"])
@@ -396,6 +524,56 @@ def list_media(
     """Listar mídias de um cão (apenas admin)"""
     return db.query(models.Media).filter(models.Media.dog_id == dog_id).all()
 
+@app.get("/api/media/jobs", response_model=List[schemas.MediaResponse], tags=["Mídia"])
+def list_video_jobs(
+    processing_status: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_admin_user)
+):
+    """Listar vídeos e o status do processamento; por padrão, os não concluídos (apenas admin)"""
+    query = db.query(models.Media).filter(models.Media.file_type == "video")
+    if processing_status:
+        query = query.filter(models.Media.processing_status == processing_status)
+    else:
+        query = query.filter(or_(
+            models.Media.processing_status.is_(None),
+            models.Media.processing_status != STATUS_DONE
+        ))
+    return query.order_by(models.Media.uploaded_at.desc()).all()
+
+@app.get("/api/media/{media_id}", response_model=schemas.MediaResponse, tags=["Mídia"])
+def get_media(
+    media_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_admin_user)
+):
+    """Obter mídia, incluindo o status do processamento de vídeo (apenas admin)"""
+    media = db.query(models.Media).filter(models.Media.id == media_id).first()
+    if not media:
+        raise HTTPException(status_code=404, detail="Mídia não encontrada")
+    return media
+
+@app.post("/api/media/{media_id}/reprocess", response_model=schemas.MediaResponse, tags=["Mídia"])
+def reprocess_media(
+    media_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_admin_user)
+):
+    """Reenfileirar o processamento de um vídeo (apenas admin)"""
+    media = db.query(models.Media).filter(models.Media.id == media_id).first()
+    if not media:
+        raise HTTPException(status_code=404, detail="Mídia não encontrada")
+    if media.file_type != "video":
+        raise HTTPException(status_code=400, detail="Apenas vídeos são processados")
+    
+    media.processing_status = STATUS_PENDING
+    media.processing_error = None
+    db.commit()
+    db.refresh(media)
+    
+    video_processor.submit(media.id)
+    return media
+
 @app.delete("/api/media/{media_id}", tags=["Mídia"])
 def delete_media(
     media_id: int,
@@ -407,13 +585,14 @@ def delete_media(
     if not media:
         raise HTTPException(status_code=404, detail="Mídia não encontrada")
     
-    # Deletar arquivo físico
-    try:
-        file_path = media.file_path.lstrip("/")
-        if os.path.exists(file_path):
-            os.remove(file_path)
-    except:
-        pass
+    # Deletar arquivo e variantes no storage
+    for key in (media.key, media.transcoded_key, media.poster_key):
+        if not key:
+            continue
+        try:
+            media.storage.delete(key)
+        except Exception:
+            pass
     
     db.delete(media)
     db.commit()
@@ -443,23 +622,43 @@ def get_stats(
         "pending_trainings": pending_trainings
     }
 
+@app.get("/api/stats/limits", tags=["Dashboard"])
+def get_limit_stats(current_user: models.User = Depends(get_admin_user)):
+    """Requisições em andamento e rejeitadas por rate limit/sobrecarga (apenas admin)"""
+    return limiter.stats()
+
 # ============ FRONTEND ============
 
 @app.get("/", include_in_schema=False)
-def serve_frontend():
+def serve_frontend(request: Request):
     """Servir frontend"""
-    return FileResponse("static/index.html")
+    return assets.shell_response(request.headers.get("accept-encoding", ""))
 
 @app.get("/pet/{access_code}", include_in_schema=False)
-def serve_pet_profile(access_code: str):
-    """Servir página de perfil do pet"""
-    return FileResponse("static/index.html")
+def serve_pet_profile(access_code: str, request: Request, db: Session = Depends(get_db)):
+    """Servir página de perfil do pet com os dados públicos já embutidos"""
+    dog = db.query(models.Dog).filter(models.Dog.access_code == access_code).first()
+    profile_json = public_profile(db, dog).model_dump_json() if dog else None
+    return assets.pet_profile_response(profile_json, request.headers.get("accept-encoding", ""))
+
+@app.get("/assets/{filename}", include_in_schema=False)
+def serve_asset(filename: str, request: Request):
+    """Servir bundles do frontend (nome com hash, cache imutável)"""
+    return assets.asset_response(filename, request.headers.get("accept-encoding", ""))
 
 # ============ STARTUP ============
 
 @app.on_event("startup")
 def startup_event():
-    """Criar admin padrão se não existir"""
+    """Criar tabelas, diretórios e admin padrão se não existirem, gerar os
+    assets do frontend e iniciar o processamento de vídeos"""
+    Base.metadata.create_all(bind=engine)
+    ensure_columns()
+    for directory in ("data", "uploads", "uploads/photos", "uploads/videos"):
+        os.makedirs(directory, exist_ok=True)
+
+    assets.build_assets()
+
     db = next(get_db())
     admin = db.query(models.User).filter(models.User.email == "admin@petwalker.com").first()
     if not admin:
@@ -472,7 +671,19 @@ def startup_event():
         db.add(admin)
         db.commit()
         print("[OK] Admin padrao criado: admin@petwalker.com / admin123")
+    
+    # Bancos anteriores aos agregados: calcular a partir do histórico
+    has_history = db.query(models.Walk).first() or db.query(models.Training).first()
+    if has_history and not db.query(models.DogActivityRollup).first():
+        analytics.rebuild(db)
     db.close()
+    
+    video_processor.start()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    """Encerrar o pool de processamento de vídeos"""
+    video_processor.stop()
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, Float
+from sqlalchemy import Column, Integer, String, DateTime, Date, Text, ForeignKey, Boolean, Float, UniqueConstraint
 from sqlalchemy.orm import relationship
 from database import Base
+from storage import StorageBackend, get_storage, get_local_storage, key_from_file_path
 from datetime import datetime
 import uuid
 
@@ -40,6 +41,7 @@ class Dog(Base):
     walks = relationship("Walk", back_populates="dog", cascade="all, delete-orphan")
     trainings = relationship("Training", back_populates="dog", cascade="all, delete-orphan")
     media = relationship("Media", back_populates="dog", cascade="all, delete-orphan")
+    activity_rollups = relationship("DogActivityRollup", cascade="all, delete-orphan")
 
 class Walk(Base):
     __tablename__ = "walks"
@@ -81,7 +83,62 @@ class Media(Base):
     file_type = Column(String(50))  # image, video
     caption = Column(Text)
     uploaded_at = Column(DateTime, default=datetime.utcnow)
+    storage_key = Column(String(500))  # chave no backend de armazenamento (storage.py)
+    content_type = Column(String(100))
+    size_bytes = Column(Integer)
+    # Processamento de vídeo (video.py)
+    processing_status = Column(String(20))  # pendente, processando, concluido, erro
+    processing_error = Column(Text)
+    processed_at = Column(DateTime)
+    duration_seconds = Column(Float)
+    width = Column(Integer)
+    height = Column(Integer)
+    transcoded_key = Column(String(500))  # MP4 H.264 com faststart
+    poster_key = Column(String(500))
     
     # Relacionamentos
     dog = relationship("Dog", back_populates="media")
 
+    @property
+    def key(self) -> str:
+        # Registros antigos só têm file_path ("/uploads/photos/x.jpg")
+        return self.storage_key or key_from_file_path(self.file_path)
+
+    @property
+    def storage(self) -> StorageBackend:
+        """Backend do arquivo e das variantes: registros antigos (sem
+        storage_key) ficam em uploads/ qualquer que seja o STORAGE_BACKEND"""
+        return get_storage() if self.storage_key else get_local_storage()
+
+    @property
+    def url(self) -> str:
+        """URL de leitura (no S3, pré-assinada)"""
+        return self.storage.url(self.key)
+
+    @property
+    def video_url(self):
+        return self.storage.url(self.transcoded_key) if self.transcoded_key else None
+
+    @property
+    def poster_url(self):
+        return self.storage.url(self.poster_key) if self.poster_key else None
+
+
+class DogActivityRollup(Base):
+    """Agregados diários/semanais de passeios e adestramento (analytics.py)"""
+    __tablename__ = "dog_activity_rollups"
+    __table_args__ = (
+        UniqueConstraint("dog_id", "period", "period_start", "activity", "training_type"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    dog_id = Column(Integer, ForeignKey("dogs.id"), index=True)
+    period = Column(String(10))  # day, week
+    period_start = Column(Date)
+    activity = Column(String(20))  # walk, training
+    training_type = Column(String(100), default="")  # vazio para passeios
+    total = Column(Integer, default=0)
+    completed = Column(Integer, default=0)
+    canceled = Column(Integer, default=0)
+    minutes = Column(Integer, default=0)
+    completed_minutes = Column(Integer, default=0)
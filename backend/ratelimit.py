@@ -0,0 +1,252 @@
+"""Rate limiting (token bucket) e descarte de carga para a API.
+
+- Regras por rota: cada regra define taxa (requisições/segundo) e rajada
+  máxima, contadas por IP ("ip") ou somadas para todos os clientes ("route").
+- Descarte de carga: com mais de `max_in_flight` requisições em andamento,
+  só passam as rotas administrativas (/api/* fora de auth e público) com
+  token JWT válido; as demais recebem 503 com Retry-After.
+- Configuração por variáveis de ambiente (limiter_from_env).
+
+Os contadores ficam em memória (um processo, como o resto da aplicação) e
+podem ser consultados em GET /api/stats/limits.
+"""
+from collections import Counter
+from typing import List, Optional
+import json
+import math
+import os
+import re
+import threading
+import time
+
+from jose import JWTError, jwt
+
+from auth import SECRET_KEY, ALGORITHM
+
+# Limite de chaves no armazenamento antes de limpar buckets ociosos
+MAX_BUCKETS = 100_000
+
+class RateLimitRule:
+    def __init__(self, name: str, path: str, rate: float, burst: int,
+                 methods: Optional[List[str]] = None, scope: str = "ip"):
+        """`path` é uma expressão regular comparada com o caminho inteiro;
+        `rate` em requisições por segundo"""
+        if scope not in ("ip", "route"):
+            raise ValueError(f"Escopo inválido: {scope}")
+        self.name = name
+        self.pattern = re.compile(f"^{path}$")
+        self.rate = rate
+        self.burst = burst
+        self.methods = {m.upper() for m in methods} if methods else None
+        self.scope = scope
+
+    def matches(self, method: str, path: str) -> bool:
+        if self.methods is not None and method not in self.methods:
+            return False
+        return self.pattern.match(path) is not None
+
+PUBLIC_PROFILE_PATH = r"/(api/public/dog|pet)/[^/]+"
+
+# nome: (caminho, requisições por minuto, rajada, métodos, escopo)
+DEFAULT_RULES = {
+    "login": ("/api/auth/login", 5, 5, ["POST"], "ip"),
+    "register": ("/api/auth/register", 3, 3, ["POST"], "ip"),
+    # Perfis públicos: limite por IP contra varredura de códigos de acesso e
+    # limite total para um link que viralize não ocupar o worker
+    "public_profile": (PUBLIC_PROFILE_PATH, 60, 30, ["GET"], "ip"),
+    "public_profile_total": (PUBLIC_PROFILE_PATH, 3000, 100, ["GET"], "route"),
+}
+
+DEFAULT_MAX_IN_FLIGHT = 64
+DEFAULT_SHED_RETRY_AFTER = 1
+
+# Rotas /api/* abertas sem token; as demais são administrativas
+UNAUTHENTICATED_API_PREFIXES = ("/api/auth/", "/api/public/")
+
+def rules_from_env() -> List[RateLimitRule]:
+    """Regras padrão, com taxa e rajada ajustáveis por variáveis de ambiente
+    (ex: RATE_LIMIT_PUBLIC_PROFILE_PER_MINUTE=120, RATE_LIMIT_LOGIN_BURST=10)"""
+    rules = []
+    for name, (path, per_minute, burst, methods, scope) in DEFAULT_RULES.items():
+        prefix = f"RATE_LIMIT_{name.upper()}"
+        per_minute = float(os.getenv(f"{prefix}_PER_MINUTE", per_minute))
+        burst = int(os.getenv(f"{prefix}_BURST", burst))
+        if per_minute <= 0:
+            continue  # taxa 0 desativa a regra
+        rules.append(RateLimitRule(name, path, rate=per_minute / 60, burst=burst,
+                                   methods=methods, scope=scope))
+    return rules
+
+class TokenBucketStore:
+    """Buckets em memória, indexados por (regra, cliente)"""
+
+    def __init__(self, max_buckets: int = MAX_BUCKETS, clock=time.monotonic):
+        self.max_buckets = max_buckets
+        self.clock = clock
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key: tuple, rate: float, burst: int) -> float:
+        """Consome um token. Retorna 0 se permitido, ou os segundos até o
+        próximo token disponível."""
+        now = self.clock()
+        with self._lock:
+            tokens, last, _ = self._buckets.get(key, (burst, now, 0))
+            tokens = min(burst, tokens + (now - last) * rate)
+            # Guardamos quando o bucket estará cheio de novo, para a limpeza
+            full_at = now + (burst - tokens + 1) / rate
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now, full_at)
+                if len(self._buckets) > self.max_buckets:
+                    self._evict(now)
+                return 0.0
+            self._buckets[key] = (tokens, now, full_at)
+            return (1 - tokens) / rate
+
+    def _evict(self, now: float):
+        # Buckets que já teriam enchido de novo equivalem a não existir
+        self._buckets = {k: v for k, v in self._buckets.items() if v[2] > now}
+        if len(self._buckets) > self.max_buckets:
+            self._buckets.clear()
+
+    def __len__(self):
+        return len(self._buckets)
+
+class RateLimiter:
+    """Configuração e estado compartilhado (buckets, requisições em
+    andamento e contadores de rejeição)"""
+
+    def __init__(self, rules: Optional[List[RateLimitRule]] = None,
+                 max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                 shed_retry_after: int = DEFAULT_SHED_RETRY_AFTER,
+                 trusted_proxies: int = 0,
+                 store: Optional[TokenBucketStore] = None):
+        self.rules = rules_from_env() if rules is None else rules
+        self.max_in_flight = max_in_flight
+        self.shed_retry_after = shed_retry_after
+        self.trusted_proxies = trusted_proxies
+        self.store = store or TokenBucketStore()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.counters = Counter()
+
+    def client_ip(self, scope) -> str:
+        """IP do cliente. Atrás de `trusted_proxies` proxies reversos usa o
+        X-Forwarded-For, contando da direita: as entradas à esquerda das que
+        nossos proxies acrescentaram vêm do próprio cliente e podem ser falsas"""
+        if self.trusted_proxies:
+            forwarded = []
+            for name, value in scope.get("headers", []):
+                if name == b"x-forwarded-for":
+                    forwarded.extend(ip.strip() for ip in value.decode("latin-1").split(","))
+            if len(forwarded) >= self.trusted_proxies:
+                return forwarded[-self.trusted_proxies]
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def check_rules(self, scope) -> Optional[tuple]:
+        """Retorna (regra, segundos de espera) se a requisição exceder alguma regra"""
+        method = scope["method"]
+        path = scope["path"]
+        ip = None
+        for rule in self.rules:
+            if not rule.matches(method, path):
+                continue
+            if rule.scope == "ip":
+                ip = ip or self.client_ip(scope)
+                key = (rule.name, ip)
+            else:
+                key = (rule.name,)
+            wait = self.store.consume(key, rule.rate, rule.burst)
+            if wait:
+                return rule, wait
+        return None
+
+    def is_admin_request(self, scope) -> bool:
+        """Rota administrativa com token JWT válido (assinatura e validade,
+        sem consultar o banco; o usuário é carregado por get_current_user)"""
+        path = scope["path"]
+        if not path.startswith("/api/") or path.startswith(UNAUTHENTICATED_API_PREFIXES):
+            return False
+        for name, value in scope.get("headers", []):
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() != "bearer" or not token:
+                    return False
+                try:
+                    # O "sub" é verificado por get_current_user
+                    jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM],
+                               options={"verify_sub": False})
+                except JWTError:
+                    return False
+                return True
+        return False
+
+    def should_shed(self, scope) -> bool:
+        return self.in_flight >= self.max_in_flight and not self.is_admin_request(scope)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "max_in_flight": self.max_in_flight,
+            "buckets": len(self.store),
+            "rejected": dict(self.counters),
+        }
+
+class RateLimitMiddleware:
+    """Middleware ASGI que aplica o RateLimiter"""
+
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.limiter
+        limited = limiter.check_rules(scope)
+        if limited:
+            rule, wait = limited
+            limiter.counters[f"rate_limited:{rule.name}"] += 1
+            await _reject(send, 429, "Muitas requisições. Tente novamente mais tarde.", wait)
+            return
+
+        if limiter.should_shed(scope):
+            limiter.counters["shed"] += 1
+            await _reject(send, 503, "Servidor sobrecarregado. Tente novamente em instantes.",
+                          limiter.shed_retry_after)
+            return
+
+        limiter.in_flight += 1
+        limiter.peak_in_flight = max(limiter.peak_in_flight, limiter.in_flight)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.in_flight -= 1
+
+async def _reject(send, status_code: int, detail: str, retry_after: float):
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+def limiter_from_env() -> RateLimiter:
+    """RateLimiter configurado por variáveis de ambiente:
+    RATE_LIMIT_TRUSTED_PROXIES (número de proxies reversos na frente da API),
+    RATE_LIMIT_MAX_IN_FLIGHT, RATE_LIMIT_SHED_RETRY_AFTER e as taxas das regras"""
+    return RateLimiter(
+        rules=rules_from_env(),
+        max_in_flight=int(os.getenv("RATE_LIMIT_MAX_IN_FLIGHT", DEFAULT_MAX_IN_FLIGHT)),
+        shed_retry_after=int(os.getenv("RATE_LIMIT_SHED_RETRY_AFTER", DEFAULT_SHED_RETRY_AFTER)),
+        trusted_proxies=int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "0")),
+    )
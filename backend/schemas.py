@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
-from datetime import datetime
-from typing import Optional, List
+from datetime import datetime, date
+from typing import Optional, List, Dict
 
 # ============ User Schemas ============
 
@@ -121,13 +121,64 @@ class MediaResponse(BaseModel):
     id: int
     dog_id: int
     file_path: str
+    url: str
     file_type: str
     caption: Optional[str] = None
+    content_type: Optional[str] = None
+    size_bytes: Optional[int] = None
     uploaded_at: datetime
+    processing_status: Optional[str] = None
+    processing_error: Optional[str] = None
+    processed_at: Optional[datetime] = None
+    duration_seconds: Optional[float] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    video_url: Optional[str] = None
+    poster_url: Optional[str] = None
     
     class Config:
         from_attributes = True
 
+class MediaUploadRequest(BaseModel):
+    filename: str
+    content_type: str
+
+class MediaUploadTicket(BaseModel):
+    key: str
+    upload_url: str
+    method: str
+    headers: Dict[str, str] = {}
+    expires_in: int
+
+class MediaUploadComplete(BaseModel):
+    key: str
+    caption: Optional[str] = None
+
+# ============ Analytics Schemas ============
+
+class ActivityBucket(BaseModel):
+    period_start: date
+    walks: int
+    walks_completed: int
+    walk_minutes: int
+    trainings: int
+    trainings_completed: int
+    training_minutes: int
+    completion_rate: Optional[float] = None
+
+class TrainingTypeStats(BaseModel):
+    training_type: str
+    sessions: int
+    completed: int
+    minutes: int
+    completion_rate: Optional[float] = None
+
+class DogAnalytics(BaseModel):
+    dog_id: int
+    period: str
+    series: List[ActivityBucket]
+    trainings_by_type: List[TrainingTypeStats]
+
 # ============ Full Dog Profile ============
 
 class DogFullProfile(DogResponse):
@@ -136,3 +187,5 @@ class DogFullProfile(DogResponse):
     trainings: List[TrainingResponse] = []
     media: List[MediaResponse] = []
 
+class PublicDogProfile(DogFullProfile):
+    analytics: Optional[DogAnalytics] = None
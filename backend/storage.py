@@ -0,0 +1,210 @@
+"""Armazenamento de mídias (fotos e vídeos).
+
+O backend é escolhido pela variável de ambiente STORAGE_BACKEND:
+
+- local (padrão): arquivos em uploads/, servidos pela própria API em /uploads
+- s3: bucket S3 ou compatível (MinIO etc). O app mobile envia e baixa os
+  arquivos direto do storage com URLs pré-assinadas; a API só registra os
+  metadados em models.Media.
+
+Configuração do S3: S3_BUCKET, S3_ENDPOINT_URL (ex: http://localhost:9000
+para MinIO), S3_ACCESS_KEY, S3_SECRET_KEY, S3_REGION e, opcionalmente,
+S3_PUBLIC_URL quando o bucket permite leitura pública.
+"""
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Optional
+import os
+import shutil
+
+# Validade das URLs pré-assinadas
+PRESIGNED_EXPIRES_SECONDS = 15 * 60
+
+class StorageError(Exception):
+    pass
+
+class StorageBackend(ABC):
+    """Interface comum dos backends. As chaves são caminhos relativos,
+    como "photos/<uuid>.jpg"."""
+
+    name = ""
+    supports_direct_upload = False
+
+    @abstractmethod
+    def save(self, key: str, fileobj: BinaryIO, content_type: str):
+        pass
+
+    @abstractmethod
+    def delete(self, key: str):
+        pass
+
+    @abstractmethod
+    def size(self, key: str) -> Optional[int]:
+        """Tamanho do objeto em bytes, ou None se não existir"""
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        """URL para leitura do objeto"""
+
+    @abstractmethod
+    def download(self, key: str, dest_path: str):
+        """Copia o objeto para um arquivo local"""
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Caminho do objeto no disco, quando o backend for local"""
+        return None
+
+    def presigned_upload(self, key: str, content_type: str,
+                         expires_in: int = PRESIGNED_EXPIRES_SECONDS) -> dict:
+        """Dados para o cliente enviar o arquivo direto ao storage"""
+        raise StorageError("Backend de armazenamento não suporta upload direto")
+
+class LocalStorage(StorageBackend):
+    name = "local"
+
+    def __init__(self, root: str = "uploads", base_url: str = "/uploads"):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def _path(self, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(os.path.normpath(self.root) + os.sep):
+            raise StorageError(f"Chave inválida: {key}")
+        return path
+
+    def save(self, key: str, fileobj: BinaryIO, content_type: str):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as buffer:
+            shutil.copyfileobj(fileobj, buffer)
+
+    def delete(self, key: str):
+        path = self._path(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def size(self, key: str) -> Optional[int]:
+        path = self._path(key)
+        return os.path.getsize(path) if os.path.exists(path) else None
+
+    def download(self, key: str, dest_path: str):
+        shutil.copyfile(self._path(key), dest_path)
+
+    def local_path(self, key: str) -> Optional[str]:
+        return self._path(key)
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+class S3Storage(StorageBackend):
+    name = "s3"
+    supports_direct_upload = True
+
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None,
+                 access_key: Optional[str] = None, secret_key: Optional[str] = None,
+                 region: Optional[str] = None, public_url: Optional[str] = None):
+        try:
+            import boto3
+            from botocore.config import Config
+        except ImportError:
+            raise StorageError("STORAGE_BACKEND=s3 requer o pacote boto3")
+
+        self.bucket = bucket
+        self.public_url = public_url.rstrip("/") if public_url else None
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            region_name=region,
+            # Endereçamento por caminho funciona com MinIO e similares
+            config=Config(signature_version="s3v4", s3={"addressing_style": "path"}),
+        )
+
+    def save(self, key: str, fileobj: BinaryIO, content_type: str):
+        self.client.upload_fileobj(
+            fileobj, self.bucket, key, ExtraArgs={"ContentType": content_type}
+        )
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def size(self, key: str) -> Optional[int]:
+        from botocore.exceptions import ClientError
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return head["ContentLength"]
+
+    def download(self, key: str, dest_path: str):
+        self.client.download_file(self.bucket, key, dest_path)
+
+    def url(self, key: str) -> str:
+        if self.public_url:
+            return f"{self.public_url}/{key}"
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=PRESIGNED_EXPIRES_SECONDS,
+        )
+
+    def presigned_upload(self, key: str, content_type: str,
+                         expires_in: int = PRESIGNED_EXPIRES_SECONDS) -> dict:
+        upload_url = self.client.generate_presigned_url(
+            "put_object",
+            Params={"Bucket": self.bucket, "Key": key, "ContentType": content_type},
+            ExpiresIn=expires_in,
+        )
+        return {
+            "upload_url": upload_url,
+            "method": "PUT",
+            "headers": {"Content-Type": content_type},
+            "expires_in": expires_in,
+        }
+
+_storage: Optional[StorageBackend] = None
+
+def get_storage() -> StorageBackend:
+    """Backend configurado (criado uma vez por processo)"""
+    global _storage
+    if _storage is None:
+        backend = os.getenv("STORAGE_BACKEND", "local").lower()
+        if backend == "local":
+            _storage = LocalStorage()
+        elif backend == "s3":
+            bucket = os.getenv("S3_BUCKET")
+            if not bucket:
+                raise StorageError("S3_BUCKET não configurado")
+            _storage = S3Storage(
+                bucket=bucket,
+                endpoint_url=os.getenv("S3_ENDPOINT_URL"),
+                access_key=os.getenv("S3_ACCESS_KEY"),
+                secret_key=os.getenv("S3_SECRET_KEY"),
+                region=os.getenv("S3_REGION", "us-east-1"),
+                public_url=os.getenv("S3_PUBLIC_URL"),
+            )
+        else:
+            raise StorageError(f"STORAGE_BACKEND desconhecido: {backend}")
+    return _storage
+
+_local_storage: Optional[StorageBackend] = None
+
+def get_local_storage() -> StorageBackend:
+    """Backend local (uploads/), onde continuam as mídias enviadas antes do
+    storage_key mesmo depois de trocar STORAGE_BACKEND para s3"""
+    global _local_storage
+    storage = get_storage()
+    if storage.name == "local":
+        return storage
+    if _local_storage is None:
+        _local_storage = LocalStorage()
+    return _local_storage
+
+def key_from_file_path(file_path: str) -> str:
+    """Converte o file_path legado ("/uploads/photos/x.jpg") em chave"""
+    path = file_path.lstrip("/")
+    if path.startswith("uploads/"):
+        path = path[len("uploads/"):]
+    return path
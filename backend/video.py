@@ -0,0 +1,211 @@
+"""Processamento de vídeos em segundo plano.
+
+Vídeos enviados chegam como o celular gravou (muitas vezes HEVC/MOV, que
+vários navegadores não reproduzem). Cada vídeo vira um job que, em um pool
+de processos, usa o ffmpeg local para:
+
+- transcodificar para H.264/AAC em MP4 com faststart (reprodução imediata);
+- extrair um quadro como poster para a galeria;
+- registrar duração, resolução e as chaves das variantes em models.Media.
+
+O status do job fica em Media.processing_status. Configuração: FFMPEG_PATH,
+FFPROBE_PATH e VIDEO_WORKERS (padrão 1, o ffmpeg já usa várias threads).
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import uuid
+
+from database import SessionLocal
+import models
+
+FFMPEG = os.getenv("FFMPEG_PATH", "ffmpeg")
+FFPROBE = os.getenv("FFPROBE_PATH", "ffprobe")
+VIDEO_WORKERS = int(os.getenv("VIDEO_WORKERS", "1"))
+
+# Menor lado do vídeo transcodificado (720p), sem ampliar vídeos menores
+MAX_SHORT_SIDE = 720
+FFMPEG_TIMEOUT = 30 * 60
+
+STATUS_PENDING = "pendente"
+STATUS_PROCESSING = "processando"
+STATUS_DONE = "concluido"
+STATUS_ERROR = "erro"
+
+class VideoProcessingError(Exception):
+    pass
+
+# ============ FFMPEG (executado nos processos do pool) ============
+
+def _run(args: list) -> str:
+    try:
+        result = subprocess.run(args, capture_output=True, text=True, timeout=FFMPEG_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        raise VideoProcessingError(f"{os.path.basename(args[0])} excedeu o tempo limite")
+    if result.returncode != 0:
+        raise VideoProcessingError(result.stderr.strip()[-1000:] or f"{args[0]} falhou")
+    return result.stdout
+
+def probe_video(path: str) -> dict:
+    """Duração (segundos) e resolução do primeiro stream de vídeo"""
+    output = _run([
+        FFPROBE, "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=width,height:format=duration",
+        "-of", "json", path
+    ])
+    data = json.loads(output)
+    streams = data.get("streams") or []
+    if not streams:
+        raise VideoProcessingError("Arquivo sem stream de vídeo")
+    duration = data.get("format", {}).get("duration")
+    return {
+        "duration": float(duration) if duration not in (None, "N/A") else None,
+        "width": streams[0].get("width"),
+        "height": streams[0].get("height"),
+    }
+
+def transcode_video(src_path: str, out_dir: str) -> dict:
+    """Gera video.mp4 (H.264/AAC, faststart) e poster.jpg em out_dir"""
+    video_path = os.path.join(out_dir, "video.mp4")
+    poster_path = os.path.join(out_dir, "poster.jpg")
+    scale = (
+        f"scale='if(gt(iw,ih),-2,min({MAX_SHORT_SIDE},iw))'"
+        f":'if(gt(iw,ih),min({MAX_SHORT_SIDE},ih),-2)'"
+    )
+    _run([
+        FFMPEG, "-y", "-v", "error", "-i", src_path,
+        "-map", "0:v:0", "-map", "0:a:0?",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "23", "-pix_fmt", "yuv420p",
+        "-vf", scale,
+        "-c:a", "aac", "-b:a", "128k",
+        "-movflags", "+faststart",
+        video_path
+    ])
+
+    # Metadados do resultado (já com a rotação do celular aplicada)
+    info = probe_video(video_path)
+    seek = min(1.0, info["duration"] / 2) if info["duration"] else 0
+    _run([
+        FFMPEG, "-y", "-v", "error", "-ss", f"{seek:.3f}", "-i", video_path,
+        "-frames:v", "1", "-q:v", "3", poster_path
+    ])
+    return {**info, "video_path": video_path, "poster_path": poster_path}
+
+# ============ FILA DE JOBS ============
+
+class VideoProcessor:
+    """Fila de jobs: threads coordenam storage e banco, o pool de processos
+    executa o ffmpeg"""
+
+    def __init__(self, workers: int = VIDEO_WORKERS):
+        self.workers = workers
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.threads: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def available(self) -> bool:
+        return shutil.which(FFMPEG) is not None and shutil.which(FFPROBE) is not None
+
+    def start(self):
+        if not self.available:
+            print("[AVISO] ffmpeg/ffprobe não encontrados; vídeos não serão processados")
+            return
+        # spawn: o processo principal tem threads (uvicorn, coordenadores) e
+        # conexões abertas, que não devem ser herdadas via fork
+        self.pool = ProcessPoolExecutor(max_workers=self.workers,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        self.threads = ThreadPoolExecutor(max_workers=self.workers)
+
+        # Retomar jobs interrompidos
+        db = SessionLocal()
+        try:
+            pending = db.query(models.Media.id).filter(
+                models.Media.file_type == "video",
+                models.Media.processing_status.in_([STATUS_PENDING, STATUS_PROCESSING])
+            ).all()
+        finally:
+            db.close()
+        for (media_id,) in pending:
+            self.submit(media_id)
+
+    def stop(self):
+        if self.threads is not None:
+            self.threads.shutdown(wait=False, cancel_futures=True)
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.threads = None
+            self.pool = None
+
+    def submit(self, media_id: int):
+        """Enfileira o processamento (fica pendente se o ffmpeg não estiver disponível)"""
+        if self.threads is not None:
+            self.threads.submit(self._process, media_id)
+
+    def _process(self, media_id: int):
+        db = SessionLocal()
+        saved_keys = []
+        try:
+            media = db.query(models.Media).filter(models.Media.id == media_id).first()
+            if not media:
+                return
+            # Variantes ficam no mesmo backend do original
+            storage = media.storage
+            media.processing_status = STATUS_PROCESSING
+            db.commit()
+
+            # Sufixo novo a cada processamento: as variantes atuais continuam
+            # válidas (e referenciadas) até o commit do resultado
+            base = f"{media.key.rsplit('.', 1)[0]}.{uuid.uuid4().hex[:8]}"
+            previous_keys = [media.transcoded_key, media.poster_key]
+            with tempfile.TemporaryDirectory() as tmp:
+                src_path = storage.local_path(media.key)
+                if src_path is None:
+                    src_path = os.path.join(tmp, "source")
+                    storage.download(media.key, src_path)
+
+                result = self.pool.submit(transcode_video, src_path, tmp).result()
+
+                for key, path, content_type in (
+                    (f"{base}.web.mp4", result["video_path"], "video/mp4"),
+                    (f"{base}.poster.jpg", result["poster_path"], "image/jpeg"),
+                ):
+                    with open(path, "rb") as f:
+                        storage.save(key, f, content_type)
+                    saved_keys.append(key)
+
+            media.transcoded_key, media.poster_key = saved_keys
+            media.duration_seconds = result["duration"]
+            media.width = result["width"]
+            media.height = result["height"]
+            media.processing_status = STATUS_DONE
+            media.processing_error = None
+            media.processed_at = datetime.utcnow()
+            db.commit()
+            _delete_objects(storage, [k for k in previous_keys if k and k not in saved_keys])
+        except Exception as e:
+            db.rollback()
+            media = db.query(models.Media).filter(models.Media.id == media_id).first()
+            if media:
+                media.processing_status = STATUS_ERROR
+                media.processing_error = str(e)[:1000]
+                db.commit()
+            # Variantes gravadas antes da falha não ficam registradas no banco
+            _delete_objects(storage, saved_keys)
+            print(f"[ERRO] Falha ao processar vídeo {media_id}: {e}")
+        finally:
+            db.close()
+
+def _delete_objects(storage, keys: list):
+    """Remove objetos sem que um erro do storage substitua o erro original"""
+    for key in keys:
+        try:
+            storage.delete(key)
+        except Exception as e:
+            print(f"[AVISO] Falha ao remover {key}: {e}")
+
+video_processor = VideoProcessor()
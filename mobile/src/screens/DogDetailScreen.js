@@ -66,22 +66,28 @@ export default function DogDetailScreen() {
 
     if (!result.canceled) {
       const asset = result.assets[0];
-      const formData = new FormData();
       
       const uriParts = asset.uri.split('.');
       const fileType = uriParts[uriParts.length - 1];
-      
-      formData.append('file', {
-        uri: asset.uri,
-        name: `media.${fileType}`,
-        type: asset.type === 'video' ? `video/${fileType}` : `image/${fileType}`,
-      });
-      formData.append('caption', '');
+      const filename = `media.${fileType}`;
+      const contentType = asset.type === 'video' ? `video/${fileType}` : `image/${fileType}`;
 
       try {
-        await api.post(`/api/dogs/${dogId}/media`, formData, {
-          headers: { 'Content-Type': 'multipart/form-data' },
-        });
+        const uploaded = await uploadDirect(asset.uri, filename, contentType);
+        if (!uploaded) {
+          // Storage local: envio pela API
+          const formData = new FormData();
+          formData.append('file', {
+            uri: asset.uri,
+            name: filename,
+            type: contentType,
+          });
+          formData.append('caption', '');
+
+          await api.post(`/api/dogs/${dogId}/media`, formData, {
+            headers: { 'Content-Type': 'multipart/form-data' },
+          });
+        }
         Alert.alert('Sucesso', 'Mídia enviada com sucesso!');
         loadDog();
       } catch (error) {
@@ -90,6 +96,37 @@ export default function DogDetailScreen() {
     }
   };
 
+  // Envia o arquivo direto ao storage (S3) com URL pré-assinada.
+  // Retorna false se o servidor não suportar upload direto.
+  const uploadDirect = async (uri, filename, contentType) => {
+    let ticket;
+    try {
+      const response = await api.post(`/api/dogs/${dogId}/media/upload-url`, {
+        filename,
+        content_type: contentType,
+      });
+      ticket = response.data;
+    } catch (error) {
+      if (error.response?.status === 400) return false;
+      throw error;
+    }
+
+    const file = await fetch(uri);
+    const body = await file.blob();
+    const upload = await fetch(ticket.upload_url, {
+      method: ticket.method,
+      headers: ticket.headers,
+      body,
+    });
+    if (!upload.ok) throw new Error('Falha no upload');
+
+    await api.post(`/api/dogs/${dogId}/media/complete`, { key: ticket.key, caption: '' });
+    return true;
+  };
+
+  // URLs do S3 são absolutas; as do storage local são relativas à API
+  const mediaUri = (url) => (url.startsWith('http') ? url : `${API_URL}${url}`);
+
   const formatDate = (dateStr) => {
     const date = new Date(dateStr);
     return date.toLocaleDateString('pt-BR', {
@@ -227,7 +264,7 @@ export default function DogDetailScreen() {
             {dog.media.map((item) => (
               <View key={item.id} style={styles.mediaItem}>
                 <Image 
-                  source={{ uri: `${API_URL}${item.file_path}` }} 
+                  source={{ uri: mediaUri(item.file_type === 'video' && item.poster_url ? item.poster_url : item.url) }} 
                   style={styles.mediaImage}
                 />
                 {item.file_type === 'video' && (